@@ -1,13 +1,21 @@
 # app.py
 import os
 import uuid
+import hashlib
+import functools
+import itertools
+import threading
 import sqlite3
 from datetime import datetime
 from flask import (
-    Flask, render_template, request, redirect,
-    url_for, abort, send_file, flash, send_from_directory
+    Flask, Request, render_template, request, redirect,
+    url_for, abort, flash, send_from_directory
 )
+from cachetools import TTLCache
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import bindparam, event, func, insert, select, text, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
 from werkzeug.utils import secure_filename
 
 # --------------------------------------------------------------------
@@ -18,14 +26,23 @@ DATA_DIR = os.path.dirname(DB_FILE) if os.path.isabs(DB_FILE) else os.path.abspa
 FILES_DIR = os.path.join(DATA_DIR, "files")
 os.makedirs(DATA_DIR, exist_ok=True)
 os.makedirs(FILES_DIR, exist_ok=True)
+APP_VERSION = os.getenv("APP_VERSION", "v1")
+DB_URI = "sqlite:///" + (DB_FILE if os.path.isabs(DB_FILE) else os.path.abspath(DB_FILE))
 
 app = Flask(__name__)
 app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "devkey")   # flash용
-app.config["SQLALCHEMY_DATABASE_URI"] = (
-    f"sqlite:///{DB_FILE}" if DB_FILE.startswith("/") else f"sqlite:///{os.path.abspath(DB_FILE)}"
-)
+app.config["SQLALCHEMY_DATABASE_URI"] = DB_URI
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-db = SQLAlchemy(app)
+# 워커당 커넥션을 재사용 (PRAGMA/페이지 캐시/-wal,-shm 매핑 유지)
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+    "pool_size": 5,
+    "max_overflow": 10,
+    "connect_args": {"check_same_thread": False},
+}
+# 앞단 웹서버(apache 등)가 X-Sendfile 을 처리할 때만 켬 (없으면 빈 응답이 나감)
+app.config["USE_X_SENDFILE"] = os.getenv("USE_X_SENDFILE", "0") == "1"
+# 세션은 요청 단위(scoped, teardown 시 remove) → 커밋 후 만료시켜 다시 SELECT 할 필요 없음
+db = SQLAlchemy(app, session_options={"expire_on_commit": False})
 
 # ==== 한글 라벨 ====
 STATUS_LABELS = {
@@ -45,9 +62,76 @@ PRIORITY_LABELS = {
 STATUS_CHOICES   = [("open","접수"),("prog","처리중"),("hold","보류"),("done","완료")]
 PRIORITY_CHOICES = [("low","낮음"),("med","보통"),("high","높음"),("crit","긴급")]
 
+# 템플릿에서 필터 호출 없이 바로 조회: {{ STATUS_LABELS.get(t.status, t.status) }}
+app.jinja_env.globals.update(STATUS_LABELS=STATUS_LABELS, PRIORITY_LABELS=PRIORITY_LABELS)
+
+# 목록 페이지 크기 (?limit= 로 조정, 상한 있음)
+PAGE_SIZE     = 50
+PAGE_SIZE_MAX = 200
+
+# 이보다 짧은 검색어는 버림 (한 글자 부분 일치는 사실상 전체 행)
+SEARCH_MIN_LEN = 2
+# trigram 색인은 3글자 이상만 찾을 수 있음 → 그보다 짧으면 LIKE
+FTS_MIN_LEN = 3
+
+# 목록 화면 렌더 결과 캐시 (쓰기 시 비움, 다른 워커의 쓰기는 키의 max(updated_at) 로 감지)
+INDEX_CACHE = TTLCache(maxsize=256, ttl=30)
+INDEX_CACHE_LOCK = threading.Lock()
+
+# 상세 화면에서 수정 가능한 필드 (폼 키 == 모델 속성 == 이벤트 action)
+UPDATE_FIELDS = ("status", "assignee", "priority")
+
 # ==== 파일 업로드 디렉터리 ====
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "/data/files")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
+UPLOAD_CHUNK = 1 << 20   # 업로드 파일 쓰기 버퍼 1MB
+_blob_dirs: set[str] = set()   # 이미 만든 files/ab/cd 디렉터리 (프로세스 로컬)
+
+
+# --------------------------------------------------------------------
+# 업로드 스트림 (Werkzeug 기본 SpooledTemporaryFile 대신 FILES_DIR 에 바로 씀)
+# --------------------------------------------------------------------
+class UploadPart:
+    # multipart 파서가 write() 하는 대로 FILES_DIR/.<uuid>.part 에 쓰면서 sha256/크기 집계
+    # → 라우트는 다시 읽고 쓰지 않고 os.replace 로 자리만 옮김 (디스크 쓰기 1회)
+    def __init__(self):
+        self.path = os.path.join(FILES_DIR, f".{uuid.uuid4().hex}.part")
+        self.file = open(self.path, "w+b", buffering=UPLOAD_CHUNK)
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.digest.update(data)
+        self.size += len(data)
+        return self.file.write(data)
+
+    def __getattr__(self, name):
+        # read/seek/flush 등은 실제 파일로
+        return getattr(self.file, name)
+
+    def save_as(self, dest: str):
+        self.file.close()
+        os.replace(self.path, dest)
+
+    def close(self):
+        # 옮기지 않은 파트(중복/재사용/오류)는 지움
+        self.file.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+class UploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        part = UploadPart()
+        # 파싱 도중 끊기면 request.files 에 안 들어가므로 따로 기억해 두고 close() 에서 정리
+        self.__dict__.setdefault("upload_parts", []).append(part)
+        return part
+
+    def close(self):
+        super().close()
+        for part in self.__dict__.get("upload_parts", ()):
+            part.close()
+
+app.request_class = UploadRequest
 
 
 # --------------------------------------------------------------------
@@ -65,10 +149,22 @@ class Ticket(db.Model):
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
 
+    # 상세 화면용 (최신순). 항상 selectinload 로 명시해서 읽고, 빠뜨린 lazy 로딩(N+1)은 예외로 드러냄
+    comments    = db.relationship("Comment", order_by="Comment.id.desc()", lazy="raise_on_sql")
+    attachments = db.relationship("Attachment", order_by="Attachment.id.desc()", lazy="raise_on_sql")
+
+    # 목록 필터/정렬용 (ensure_schema 의 INDEX_DDL 과 이름/구성 동일)
+    __table_args__ = (
+        db.Index("idx_tickets_status_priority_updated", "status", "priority", "updated_at"),
+        db.Index("idx_tickets_status_updated", "status", "updated_at"),
+        db.Index("idx_tickets_priority_updated", "priority", "updated_at"),
+        db.Index("idx_tickets_updated", "updated_at"),
+    )
+
 class Comment(db.Model):
     __tablename__ = "comments"
     id         = db.Column(db.Integer, primary_key=True)
-    ticket_id  = db.Column(db.Integer, db.ForeignKey("tickets.id"), indes=True)
+    ticket_id  = db.Column(db.Integer, db.ForeignKey("tickets.id"), index=True)
     author     = db.Column(db.String(50))
     body       = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.now)
@@ -76,13 +172,18 @@ class Comment(db.Model):
 class Attachment(db.Model):
     __tablename__ = "attachments"
     id         = db.Column(db.Integer, primary_key=True)
-    ticket_id  = db.Column(db.Integer, db.ForeignKey("tickets.id"), indes=True)
+    ticket_id  = db.Column(db.Integer, db.ForeignKey("tickets.id"), index=True)
     filename   = db.Column(db.String(200))    # 원본 파일명
     stored_path= db.Column(db.String(300))    # 실제 저장 경로
     size       = db.Column(db.Integer)
     mimetype   = db.Column(db.String(100))
+    sha256     = db.Column(db.String(64))     # 내용 해시 (저장 위치 = files/ab/cd/<sha256>)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
 
+    __table_args__ = (
+        db.Index("ux_attachments_tid_sha", "ticket_id", "sha256", unique=True),
+    )
+
 class Event(db.Model):
     __tablename__ = "events"
     id         = db.Column(db.Integer, primary_key=True)
@@ -93,139 +194,374 @@ class Event(db.Model):
     to_value   = db.Column(db.String(100))
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
 
+# --------------------------------------------------------------------
+# SQLite 튜닝 (WAL + 커밋당 fsync 축소 + 캐시/mmap)
+# --------------------------------------------------------------------
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",      # 약 64MB
+    "PRAGMA mmap_size=268435456",    # 256MB
+    "PRAGMA busy_timeout=5000",      # 다른 워커가 쓰는 중이면 5초까지 대기
+)
+
+def apply_sqlite_pragmas(conn):
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
+
 # --------------------------------------------------------------------
 # 스키마 생성 + 마이그레이션(부족 컬럼 자동 추가)
 # --------------------------------------------------------------------
-def ensure_schema():
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
+TABLES_DDL = (
+    # 1) 기본 tickets 테이블
+    """
+    CREATE TABLE IF NOT EXISTS tickets (
+        id INTEGER PRIMARY KEY,
+        title TEXT NOT NULL,
+        content TEXT,
+        requester TEXT NOT NULL,
+        assignee TEXT,
+        priority TEXT NOT NULL DEFAULT 'med',
+        status TEXT NOT NULL DEFAULT 'open',
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    )
+    """,
+    # 2) comments/attachments/events 테이블
+    """
+    CREATE TABLE IF NOT EXISTS comments (
+        id INTEGER PRIMARY KEY,
+        ticket_id INTEGER NOT NULL,
+        author TEXT NOT NULL,
+        body TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        FOREIGN KEY(ticket_id) REFERENCES tickets(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS attachments (
+        id INTEGER PRIMARY KEY,
+        ticket_id INTEGER NOT NULL,
+        filename TEXT NOT NULL,
+        stored_path TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        created_at TEXT NOT NULL,
+        FOREIGN KEY(ticket_id) REFERENCES tickets(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS events (
+        id INTEGER PRIMARY KEY,
+        ticket_id INTEGER NOT NULL,
+        actor TEXT NOT NULL,
+        action TEXT NOT NULL,
+        from_value TEXT,
+        to_value TEXT,
+        created_at TEXT NOT NULL,
+        FOREIGN KEY(ticket_id) REFERENCES tickets(id)
+    )
+    """,
+)
 
-    # 1) 기본 tickets 테이블 생성
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS tickets (
-            id INTEGER PRIMARY KEY,
-            title TEXT NOT NULL,
-            content TEXT,
-            requester TEXT NOT NULL,
-            assignee TEXT,
-            priority TEXT NOT NULL DEFAULT 'med',
-            status TEXT NOT NULL DEFAULT 'open',
-            created_at TEXT NOT NULL,
-            updated_at TEXT NOT NULL
-        )
-    """)
-
-    # 2) 부족 컬럼 자동 추가 (기존 DB가 오래된 경우)
-    existing_cols = [r[1] for r in cur.execute("PRAGMA table_info(tickets)").fetchall()]
-    need_cols = [
+# 3) 오래된 DB에 없을 수 있는 컬럼 (테이블별)
+NEED_COLS = {
+    "tickets": [
         ("content",   "TEXT"),
         ("assignee",  "TEXT"),
         ("priority",  "TEXT DEFAULT 'med'"),
         ("status",    "TEXT DEFAULT 'open'"),
         ("created_at","TEXT"),
         ("updated_at","TEXT"),
-    ]
-    for name, typ in need_cols:
-        if name not in existing_cols:
-            cur.execute(f"ALTER TABLE tickets ADD COLUMN {name} {typ}")
-
-    # 3) comments/attachments/events 테이블 생성
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS comments (
-            id INTEGER PRIMARY KEY,
-            ticket_id INTEGER NOT NULL,
-            author TEXT NOT NULL,
-            body TEXT NOT NULL,
-            created_at TEXT NOT NULL,
-            FOREIGN KEY(ticket_id) REFERENCES tickets(id)
-        )
-    """)
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS attachments (
-            id INTEGER PRIMARY KEY,
-            ticket_id INTEGER NOT NULL,
-            filename TEXT NOT NULL,
-            stored_path TEXT NOT NULL,
-            size INTEGER NOT NULL,
-            created_at TEXT NOT NULL,
-            FOREIGN KEY(ticket_id) REFERENCES tickets(id)
-        )
-    """)
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS events (
-            id INTEGER PRIMARY KEY,
-            ticket_id INTEGER NOT NULL,
-            actor TEXT NOT NULL,
-            action TEXT NOT NULL,
-            from_value TEXT,
-            to_value TEXT,
-            created_at TEXT NOT NULL,
-            FOREIGN KEY(ticket_id) REFERENCES tickets(id)
-        )
-    """)
-    conn.commit()
+    ],
+    "attachments": [
+        ("mimetype",  "TEXT"),
+        ("sha256",    "TEXT"),
+    ],
+}
+
+INDEX_DDL = (
+    # 4) 인덱스 (목록 필터/정렬, 상세 화면 하위 테이블 조회)
+    #    오름차순 인덱스를 역방향으로 읽으면 (updated_at DESC, id DESC) 순서가 그대로 나옴
+    "CREATE INDEX IF NOT EXISTS idx_tickets_status_priority_updated "
+    "ON tickets(status, priority, updated_at)",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_status_updated ON tickets(status, updated_at)",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_priority_updated ON tickets(priority, updated_at)",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_updated ON tickets(updated_at)",
+    # 댓글/첨부는 모델의 index=True 와 같은 이름 (create_all 이 기존 테이블엔 인덱스를 안 만들어 줌)
+    "CREATE INDEX IF NOT EXISTS ix_comments_ticket_id ON comments(ticket_id)",
+    "CREATE INDEX IF NOT EXISTS ix_attachments_ticket_id ON attachments(ticket_id)",
+    # 위와 겹치던 예전 인덱스 (쓰기마다 유지 비용만 듦)
+    "DROP INDEX IF EXISTS idx_comments_tid",
+    "DROP INDEX IF EXISTS idx_attachments_tid",
+    # 이력은 id(=rowid) 역순으로 스트리밍 → ticket_id 단일 인덱스를 역방향으로 읽으면 정렬 불필요
+    "CREATE INDEX IF NOT EXISTS idx_events_tid ON events(ticket_id)",
+    # 같은 티켓에 같은 내용의 첨부는 한 번만 (sha256 이 NULL 인 예전 행은 제외됨)
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_attachments_tid_sha ON attachments(ticket_id, sha256)",
+
+    # 5) 제목/내용 전문 검색(FTS5) + 동기화 트리거
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS tickets_fts USING fts5(
+        title, content,
+        content='tickets', content_rowid='id',
+        tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tickets_fts_ai AFTER INSERT ON tickets BEGIN
+        INSERT INTO tickets_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tickets_fts_ad AFTER DELETE ON tickets BEGIN
+        INSERT INTO tickets_fts(tickets_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tickets_fts_au AFTER UPDATE OF title, content ON tickets BEGIN
+        INSERT INTO tickets_fts(tickets_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO tickets_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+)
+
+# 6) 예전 행 보정 (여러 번 돌려도 결과 같음)
+FIX_DML = (
+    # 목록 정렬/커서는 updated_at 이 항상 있다고 가정 → NULL 시각 채우기.
+    # 커서 비교는 문자열 비교라 SQLAlchemy DateTime 저장 형식(YYYY-MM-DD HH:MM:SS.ffffff)에 맞춤
+    "UPDATE tickets SET "
+    "created_at = COALESCE(created_at, updated_at, strftime('%Y-%m-%d %H:%M:%f000','now','localtime')), "
+    "updated_at = COALESCE(updated_at, created_at, strftime('%Y-%m-%d %H:%M:%f000','now','localtime')) "
+    "WHERE created_at IS NULL OR updated_at IS NULL",
+)
+
+# 7) 아주 예전 DB 는 본문이 body(NOT NULL) 컬럼 → 모델은 body 를 안 쓰므로 INSERT 가 실패함.
+#    SQLite 는 NOT NULL 만 뗄 수 없으므로 1) 의 tickets 구조로 다시 만들며 body 를 content 로 합침
+#    (인덱스/트리거는 DROP 과 함께 사라지고 아래 INDEX_DDL 이 다시 만듦)
+TICKETS_REBUILD = (
+    TABLES_DDL[0].replace("IF NOT EXISTS tickets", "tickets_new"),
+    "INSERT INTO tickets_new "
+    "(id, title, content, requester, assignee, priority, status, created_at, updated_at) "
+    "SELECT id, title, COALESCE(content, body), requester, assignee, "
+    "COALESCE(priority, 'med'), COALESCE(status, 'open'), created_at, updated_at FROM tickets",
+    "DROP TABLE tickets",
+    "ALTER TABLE tickets_new RENAME TO tickets",
+)
+
+# DDL 이 바뀌면 버전도 바뀜 (PRAGMA user_version 에 저장 → 같으면 워커 기동 시 DDL 전체 생략)
+SCHEMA_VERSION = int(hashlib.sha1(
+    "\n".join([*TABLES_DDL, repr(NEED_COLS), *INDEX_DDL, *FIX_DML, *TICKETS_REBUILD]).encode()
+).hexdigest()[:7], 16) or 1
+
+def ensure_schema():
+    # 트랜잭션은 직접 관리 (sqlite3 기본 모드는 DDL 마다 따로 커밋됨)
+    conn = sqlite3.connect(DB_FILE, isolation_level=None)
+    apply_sqlite_pragmas(conn)
+    cur = conn.cursor()
+
+    # 0) 이미 최신 스키마면 쓰기 잠금 없이 바로 종료
+    if cur.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION:
+        conn.close()
+        return
+
+    # 마이그레이션 전체를 한 트랜잭션으로 (fsync 1회). 동시에 뜬 워커는 잠금을 기다린 뒤 다시 확인
+    cur.execute("BEGIN IMMEDIATE")
+    if cur.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION:
+        cur.execute("ROLLBACK")
+        conn.close()
+        return
+
+    for ddl in TABLES_DDL:
+        cur.execute(ddl)
+    for table, cols in NEED_COLS.items():
+        existing_cols = [r[1] for r in cur.execute(f"PRAGMA table_info({table})").fetchall()]
+        for name, typ in cols:
+            if name not in existing_cols:
+                cur.execute(f"ALTER TABLE {table} ADD COLUMN {name} {typ}")
+    for dml in FIX_DML:
+        cur.execute(dml)
+    ticket_cols = {r[1] for r in cur.execute("PRAGMA table_info(tickets)").fetchall()}
+    rebuilt = "body" in ticket_cols
+    if rebuilt:
+        for ddl in TICKETS_REBUILD:
+            cur.execute(ddl)
+
+    has_fts = cur.execute(
+        "SELECT sql FROM sqlite_master WHERE type='table' AND name='tickets_fts'"
+    ).fetchone()
+    if has_fts and "trigram" not in has_fts[0]:
+        # 예전 unicode61 색인 → 토크나이저는 바꿀 수 없으므로 지우고 아래에서 다시 만들어 채움
+        cur.execute("DROP TABLE tickets_fts")
+        has_fts = None
+    for ddl in INDEX_DDL:
+        cur.execute(ddl)
+    if not has_fts or rebuilt:
+        # 기존 DB라면 이미 있는 티켓으로 색인 채우기 (tickets 를 다시 만들었으면 content 가 바뀌었음)
+        cur.execute("INSERT INTO tickets_fts(tickets_fts) VALUES ('rebuild')")
+
+    cur.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+    cur.execute("COMMIT")
     conn.close()
 
 with app.app_context():
+    # 요청마다 쓰는 SQLAlchemy 커넥션에도 동일한 PRAGMA 적용
+    event.listen(db.engine, "connect", lambda dbapi_conn, _rec: apply_sqlite_pragmas(dbapi_conn))
     db.create_all()
     ensure_schema()
 
 # --------------------------------------------------------------------
 # 공용 유틸/필터
 # --------------------------------------------------------------------
-   @app.template_filter("dt")
-    def fmt_dt(v: datetime):
-    return v.strftime("%Y-%m-%d %H:%M") if isinstance(v, datetime) else (v or "")
-
-    def add_event(ticket_id: int, actor: str, action: str, from_value=None, to_value=None):
+# 분 단위까지만 표시하므로 분으로 잘라서 캐시 (같은 분의 시각은 한 번만 strftime)
+@functools.lru_cache(maxsize=4096)
+def _fmt_minute(ts: datetime) -> str:
+    return ts.strftime("%Y-%m-%d %H:%M")
+
+@app.template_filter("dt")
+def fmt_dt(v: datetime):
+    if isinstance(v, datetime):
+        return _fmt_minute(v.replace(second=0, microsecond=0))
+    return v or ""
+
+def fts_query(q: str) -> str:
+    # 검색어 전체를 "..." 한 구절로 인용(연산자/따옴표 무력화) → trigram 이라 예전 LIKE '%q%' 와 같은 부분 일치
+    return '"' + q.replace('"', '""') + '"'
+
+def like_pattern(q: str) -> str:
+    # 짧은 검색어용 LIKE '%q%' (%, _ 는 글자 그대로)
+    return "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+# 목록 쿼리는 (검색 방식/상태/우선순위/커서 유무) 조합 24가지뿐 → import 시 조합별 select() 를 만들어 두고 값만 바인딩
+def build_index_stmt(search, has_status: bool, has_priority: bool, has_cursor: bool):
+    # search: None / "fts"(3글자 이상, 색인) / "like"(2글자, 직접 비교)
+    # 목록 표에 쓰는 컬럼만 (content 등 TEXT 본문, ORM 객체 생성 생략)
+    stmt = select(Ticket.id, Ticket.title, Ticket.status, Ticket.priority,
+                  Ticket.requester, Ticket.assignee, Ticket.updated_at)
+    if search == "like":
+        like = bindparam("like")
+        stmt = stmt.where(Ticket.title.like(like, escape="\\") | Ticket.content.like(like, escape="\\"))
+    elif search == "fts":
+        # FTS 후보를 CTE로 먼저 확정 → status/priority 조건이 붙어도 FTS 인덱스 유지
+        fts = text("SELECT rowid FROM tickets_fts WHERE tickets_fts MATCH :q")\
+            .columns(rowid=db.Integer)\
+            .cte("fts_match").prefix_with("MATERIALIZED")
+        stmt = stmt.join(fts, fts.c.rowid == Ticket.id)
+    if has_status:
+        stmt = stmt.where(Ticket.status == bindparam("status"))
+    if has_priority:
+        stmt = stmt.where(Ticket.priority == bindparam("priority"))
+    if has_cursor:
+        # keyset: 직전 페이지 마지막 행 (updated_at, id) 보다 뒤쪽만 → OFFSET 처럼 건너뛴 행을 읽지 않음
+        stmt = stmt.where(tuple_(Ticket.updated_at, Ticket.id) <
+                          tuple_(bindparam("cur_u", type_=db.DateTime), bindparam("cur_i", type_=db.Integer)))
+    return stmt.order_by(Ticket.updated_at.desc(), Ticket.id.desc()).limit(bindparam("limit"))
+
+INDEX_STMTS = {mask: build_index_stmt(*mask)
+               for mask in itertools.product((None, "fts", "like"), *[(False, True)] * 3)}
+
+def parse_cursor(cursor: str):
+    # "<updated_at isoformat>_<id>" → (datetime, int)
+    try:
+        u, i = cursor.rsplit("_", 1)
+        u, i = datetime.fromisoformat(u), int(i)
+    except ValueError:
+        abort(400, "bad cursor")
+    if not 0 < i < 1 << 63:   # SQLite INTEGER 범위 밖이면 바인딩에서 OverflowError
+        abort(400, "bad cursor")
+    return u, i
+
+def tickets_version():
+    # 티켓 목록이 바뀌면(생성/수정) 커지는 값 → idx_tickets_updated 끝만 읽음
+    return db.session.execute(select(func.max(Ticket.updated_at))).scalar()
+
+def index_cache_clear():
+    with INDEX_CACHE_LOCK:
+        INDEX_CACHE.clear()
+
+def index_response(html, etag: str):
+    # html=None → 304 (If-None-Match 일치)
+    resp = app.response_class(html, mimetype="text/html") if html is not None \
+        else app.response_class(status=304)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "private, must-revalidate"
+    return resp
+
+def blob_relpath(a) -> str:
+    # FILES_DIR 기준 상대 경로: 내용 주소(ab/cd/<sha256>), 예전 첨부는 <ticket_id>/<leaf>
+    if a.sha256:
+        return f"{a.sha256[:2]}/{a.sha256[2:4]}/{a.sha256}"
+    return f"{a.ticket_id}/{os.path.basename(a.stored_path)}"
+
+# 커밋은 호출한 라우트에서 한 번만 (본 변경과 같은 트랜잭션으로 묶음)
+def add_event(ticket_id: int, actor: str, action: str, from_value=None, to_value=None):
     ev = Event(ticket_id=ticket_id, actor=actor, action=action,
                from_value=from_value, to_value=to_value)
     db.session.add(ev)
-    db.session.commit()
-
-   @app.template_filter("k_status") 
-    def k_status(v):
-    return STATUS_LABELS.get(v, v or "")
 
-   @app.template_filter("k_priority")
-    def k_priority(v):
-    return PRIORITY_LABELS.get(v, v or "")
+FILESIZE_UNITS = ("B", "KB", "MB", "GB", "TB", "PB")
 
-   @app.template_filter("filesize")
-    def filesize(n):
+@app.template_filter("filesize")
+def filesize(n):
     try:
         n = int(n or 0)
     except:
         return "-"
-    for unit in ["B","KB","MB","GB","TB"]:
-        if n < 1024:
-            return f"{n:.0f} {unit}"
-        n /= 1024
-    return f"{n:.0f} PB"
-
-
-    # --------------------------------------------------------------------
-    # 라우트
-    # --------------------------------------------------------------------
-   @app.get("/")
-    def index():
-    q        = request.args.get("q", "").strip()
-    status   = request.args.get("status", "").strip()
-    priority = request.args.get("priority", "").strip()
-
-    query = Ticket.query
-    if q:
-        query = query.filter((Ticket.title.contains(q)) | (Ticket.content.contains(q)))
-    if status:
-        query = query.filter(Ticket.status == status)
-    if priority:
-        query = query.filter(Ticket.priority == priority)
+    if n <= 0:
+        return "0 B"
+    # 단위 = 비트 길이 / 10 (1024 = 2**10), 나눗셈 루프 없이 한 번에
+    k = min((n.bit_length() - 1) // 10, len(FILESIZE_UNITS) - 1)
+    return f"{n / (1 << (k * 10)):.0f} {FILESIZE_UNITS[k]}"
 
-    tickets = query.order_by(Ticket.updated_at.desc()).all()
-    return render_template("index.html", tickets=tickets, q=q, status=status, priority=priority, STATUS_CHOICES=STATUS_CHOICES, PRIORITY_CHOICES=PRIORITY_CHOICES)
 
-   @app.route("/new", methods=["GET", "POST"])
-    def new_ticket():
+# --------------------------------------------------------------------
+# 라우트
+# --------------------------------------------------------------------
+@app.get("/")
+def index():
+    q        = request.args.get("q", "").replace("\x00", "").strip()   # NUL 은 SQLite 문자열을 끊음
+    status   = request.args.get("status", "").strip()
+    priority = request.args.get("priority", "").strip()
+    cursor   = request.args.get("cursor", "").strip()
+    limit    = min(max(request.args.get("limit", PAGE_SIZE, type=int), 1), PAGE_SIZE_MAX)
+
+    key = (q, status, priority, cursor, limit, tickets_version())
+    # 목록이 그대로면 브라우저/대시보드 재요청은 304 로 끝냄 (렌더/전송 없음). 배포 버전이 바뀌면 새로 받도록 포함
+    etag = hashlib.blake2b(repr((APP_VERSION, key)).encode(), digest_size=8).hexdigest()
+    if request.if_none_match.contains(etag):
+        return index_response(None, etag)
+    with INDEX_CACHE_LOCK:
+        html = INDEX_CACHE.get(key)
+    if html is not None:
+        return index_response(html, etag)
+
+    if q and len(q) < SEARCH_MIN_LEN:
+        tickets = []   # 검색어가 너무 짧음 → 쿼리 없이 빈 결과
+    else:
+        search = None if not q else "fts" if len(q) >= FTS_MIN_LEN else "like"
+        stmt = INDEX_STMTS[(search, bool(status), bool(priority), bool(cursor))]
+        params = {"q": fts_query(q), "like": like_pattern(q),
+                  "status": status, "priority": priority, "limit": limit + 1}
+        if cursor:
+            params["cur_u"], params["cur_i"] = parse_cursor(cursor)
+        tickets = db.session.execute(stmt, params).all()
+
+    # limit+1 개를 읽어 다음 페이지 존재 여부 판단
+    next_cursor = None
+    if len(tickets) > limit:
+        tickets = tickets[:limit]
+        last = tickets[-1]
+        next_cursor = f"{last.updated_at.isoformat()}_{last.id}"
+    html = render_template("index.html", tickets=tickets, q=q, status=status, priority=priority,
+                           limit=limit, next_cursor=next_cursor,
+                           STATUS_CHOICES=STATUS_CHOICES, PRIORITY_CHOICES=PRIORITY_CHOICES)
+    with INDEX_CACHE_LOCK:
+        INDEX_CACHE[key] = html
+    return index_response(html, etag)
+
+@app.route("/new", methods=["GET", "POST"])
+def new_ticket():
     if request.method == "POST":
         title     = request.form.get("title", "").strip()
         content   = request.form.get("content", "").strip()
@@ -234,85 +570,162 @@ with app.app_context():
         if not title or not requester:
             abort(400, "title/requester required")
 
-        t = Ticket(title=title, content=content, requester=requester, priority=priority)
-        db.session.add(t); db.session.commit()
-        add_event(t.id, requester or "user", "created", None, None)
-        return redirect(url_for("ticket_detail", tid=t.id))
+        # ORM 객체/flush 없이 Core INSERT, 새 id 는 결과에서 바로
+        tid = db.session.execute(
+            insert(Ticket).values(title=title, content=content, requester=requester, priority=priority)
+        ).inserted_primary_key[0]
+        add_event(tid, requester or "user", "created", None, None)
+        db.session.commit()
+        index_cache_clear()
+        return redirect(url_for("ticket_detail", tid=tid))
     return render_template("new.html")
 
-   # 상세
-   @app.route("/ticket/<int:tid>", methods=["GET", "POST"])
-    def ticket_detail(tid: int):
-    t = Ticket.query.get_or_404(tid)
-
+# 상세
+@app.route("/ticket/<int:tid>", methods=["GET", "POST"])
+def ticket_detail(tid: int):
     if request.method == "POST":
-        # 상태/담당자 저장
-        t.status = request.form.get("status", t.status)
-        t.assignee = request.form.get("assignee", t.assignee)
-        db.session.commit()
-        add_event(t.id, request.form.get("author", "user") or "user",
-                  "update", None, f"{t.status}/{t.assignee or '-'}")
+        t = db.get_or_404(Ticket, tid)
+        # 상태/담당자/우선순위 중 바뀐 것만 반영 + 필드별 이력
+        actor = request.form.get("author", "user") or "user"
+        changed = False
+        for field in UPDATE_FIELDS:
+            nv = request.form.get(field)
+            ov = getattr(t, field) or ""
+            if nv is not None and nv != ov:
+                add_event(t.id, actor, field, ov, nv)
+                setattr(t, field, nv)
+                changed = True
+        # 바뀐 게 없으면 UPDATE/커밋/목록 캐시 비우기 모두 생략
+        if changed:
+            db.session.commit()
+            index_cache_clear()
         return redirect(url_for("ticket_detail", tid=tid))
 
-    # 목록들 조회
-    comments = Comment.query.filter_by(ticket_id=tid)\
-        .order_by(Comment.id.desc()).all()
-    files = Attachment.query.filter_by(ticket_id=tid)\
-        .order_by(Attachment.id.desc()).all()
-    events = Event.query.filter_by(ticket_id=tid)\
-        .order_by(Event.id.desc()).all()
+    # 티켓 + 댓글/첨부를 관계별 IN(...) 한 번씩으로 조회
+    t = db.session.execute(
+        select(Ticket)
+        .options(selectinload(Ticket.comments),
+                 selectinload(Ticket.attachments))
+        .where(Ticket.id == tid)
+    ).scalar_one_or_none()
+    if t is None:
+        abort(404)
+
+    # 이력은 길어질 수 있으므로 64건씩 끊어 읽으며 템플릿에서 바로 순회
+    events = db.session.execute(
+        select(Event).where(Event.ticket_id == tid).order_by(Event.id.desc())
+        .execution_options(yield_per=64)
+    ).scalars()
 
     # → 템플릿으로 넘길 이름을 'attachments' 로 고정
     return render_template(
         "detail.html",
         ticket=t,
-        comments=comments,
-        attachments=files,   # ★ 여기 이름!
-        events=events
+        comments=t.comments,
+        attachments=t.attachments,   # ★ 여기 이름!
+        events=events,
+        STATUS_CHOICES=STATUS_CHOICES,
+        PRIORITY_CHOICES=PRIORITY_CHOICES,
     )
 
-   @app.post("/ticket/<int:tid>/attach")
+@app.post("/ticket/<int:tid>/comment")
+def add_comment(tid: int):
+    author = request.form.get("author", "").strip() or "user"
+    body   = request.form.get("content", "").strip()
+    if not body:
+        return redirect(url_for("ticket_detail", tid=tid))
+
+    # 티켓을 SELECT 로 읽지 않고 수정시각 갱신 + 댓글/이력 INSERT 를 한 트랜잭션으로
+    touched = db.session.execute(
+        update(Ticket).where(Ticket.id == tid).values(updated_at=datetime.now())
+    ).rowcount
+    if not touched:
+        db.session.rollback()
+        abort(404)
+    db.session.execute(insert(Comment).values(ticket_id=tid, author=author, body=body))
+    add_event(tid, author, "comment", None, None)
+    db.session.commit()
+    index_cache_clear()
+    return redirect(url_for("ticket_detail", tid=tid))
+
+@app.post("/ticket/<int:tid>/attach")
 def upload_attach(tid: int):
-    t = Ticket.query.get_or_404(tid)
+    t = db.get_or_404(Ticket, tid)
     f = request.files.get("file")
     if not f or f.filename == "":
         return redirect(url_for("ticket_detail", tid=tid))
 
     safe_name = secure_filename(f.filename)
-    leaf = f"{uuid.uuid4().hex}__{safe_name or 'file'}"
-    tdir = os.path.join(FILES_DIR, str(t.id))
-    os.makedirs(tdir, exist_ok=True)
-
-    save_path = os.path.join(tdir, leaf)
-    f.save(save_path)
-    size = os.path.getsize(save_path)
-
-    att = Attachment(
-        ticket_id=t.id,
-        filename=safe_name,
-        stored_path=save_path,
-        size=size,
-    )
-    db.session.add(att); db.session.commit()
+
+    # 파싱하면서 이미 FILES_DIR 에 써 두고 크기/sha256 도 집계됨 (UploadRequest).
+    # 옮기지 않은 .part 는 요청이 끝날 때 지워짐
+    part = f.stream
+    sha = part.digest.hexdigest()
+
+    # 같은 티켓에 이미 같은 내용이 붙어 있으면 새로 남기지 않고 알려줌
+    dup = db.session.execute(
+        select(Attachment.filename).where(Attachment.ticket_id == t.id, Attachment.sha256 == sha)
+    ).scalar()
+    if dup is not None:
+        flash(f"같은 내용의 파일이 이미 첨부되어 있습니다: {dup}")
+        return redirect(url_for("ticket_detail", tid=t.id))
+
+    att = Attachment(ticket_id=t.id, filename=safe_name, size=part.size, sha256=sha)
+    att.stored_path = os.path.join(FILES_DIR, blob_relpath(att))
+    # 다른 티켓에 같은 내용이 있으면 그 파일을 재사용
+    if not os.path.exists(att.stored_path):
+        bdir = os.path.dirname(att.stored_path)
+        if bdir not in _blob_dirs:
+            os.makedirs(bdir, exist_ok=True)
+            _blob_dirs.add(bdir)
+        part.save_as(att.stored_path)
+
+    db.session.add(att)
     add_event(t.id, "user", "attach", None, safe_name)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # 같은 파일을 동시에 올린 다른 요청이 먼저 커밋함 (ux_attachments_tid_sha)
+        db.session.rollback()
+        flash(f"같은 내용의 파일이 이미 첨부되어 있습니다: {safe_name}")
     return redirect(url_for("ticket_detail", tid=t.id))
 
-   
-    @app.get("/files/<int:aid>")
-    def download_file(aid: int):
-    a = Attachment.query.get_or_404(aid)
-    return send_file(a.stored_path, as_attachment=True, download_name=a.filename)
-
-	# 헬스/버전
-	@app.get("/healthz")
-	def healthz():
-	    return "ok", 200
-
-	@app.get("/version")
-	def version():
-	    tag = os.getenv("APP_VERSION", "v1")
-	    return f"<h1>Service Desk ({tag})</h1>", 200
-
-	if __name__ == "__main__":
-	    # 개발 로컬 실행용(도커에선 gunicorn 사용)
-	    app.run(host="0.0.0.0", port=8080, debug=True)
+
+@app.get("/files/<int:aid>")
+def download_file(aid: int):
+    a = db.get_or_404(Attachment, aid)
+    # FILES_DIR 기준으로 전송 → gunicorn 은 wsgi.file_wrapper(sendfile)로 바로 내보냄
+    return send_from_directory(
+        FILES_DIR,
+        blob_relpath(a),
+        as_attachment=True,
+        download_name=a.filename,
+    )
+
+# 헬스/버전 — 프로브가 자주 호출하므로 Flask 요청 처리(컨텍스트/세션/훅)를 거치지 않고 WSGI 단에서 바로 응답
+VERSION_HTML = f"<h1>Service Desk ({APP_VERSION})</h1>".encode()
+FAST_ROUTES = {
+    "/healthz": (b"ok", "text/plain; charset=utf-8"),
+    "/version": (VERSION_HTML, "text/html; charset=utf-8"),
+}
+
+def fast_routes(wsgi_app):
+    def middleware(environ, start_response):
+        hit = FAST_ROUTES.get(environ.get("PATH_INFO"))
+        method = environ.get("REQUEST_METHOD")
+        if hit is None or method not in ("GET", "HEAD"):
+            return wsgi_app(environ, start_response)
+        body, ctype = hit
+        start_response("200 OK", [("Content-Type", ctype), ("Content-Length", str(len(body)))])
+        return [b"" if method == "HEAD" else body]
+    return middleware
+
+app.wsgi_app = fast_routes(app.wsgi_app)
+
+# 워커 기동 시 템플릿을 미리 컴파일 → 첫 요청에서 파싱/컴파일 비용 없음
+for _tpl in ("index.html", "new.html", "detail.html"):
+    app.jinja_env.get_template(_tpl)
+
+if __name__ == "__main__":
+    # 개발 로컬 실행용(도커에선 gunicorn 사용)
+    app.run(host="0.0.0.0", port=8080, debug=True)